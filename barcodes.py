@@ -0,0 +1,242 @@
+from collections import Counter
+from functools import lru_cache
+from itertools import groupby
+
+# Barcode/QR label lines. A label line starting with one of these prefixes is
+# drawn as a code instead of text, e.g. "EAN13:3830001234567" or "QR:https://...".
+CODE_PREFIXES = {'EAN13:': 'ean13', 'QR:': 'qr'}
+
+CODE_CACHE_SIZE = 4096  # Distinct code values kept encoded and vectorised
+
+def parse_code_line(line):
+    """Return (kind, value) for a barcode/QR line, or None for a plain text line"""
+    for prefix, kind in CODE_PREFIXES.items():
+        if line.startswith(prefix):
+            return kind, line[len(prefix):].strip()
+    return None
+
+# EAN-13 symbol tables: left-half L/G digit codes, right-half R codes and the
+# L/G parity pattern selected by the first digit
+EAN_L = ('0001101', '0011001', '0010011', '0111101', '0100011', '0110001', '0101111', '0111011', '0110111', '0001011')
+EAN_R = tuple(code.translate(str.maketrans('01', '10')) for code in EAN_L)
+EAN_G = tuple(code[::-1] for code in EAN_R)
+EAN_PARITY = ('LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG', 'LGGLLG', 'LGGGLL', 'LGLGLG', 'LGLGGL', 'LGGLGL')
+EAN_GUARDS = frozenset((0, 1, 2, 45, 46, 47, 48, 49, 92, 93, 94))  # Modules of the long guard bars
+
+# EAN-13 layout in module units (1 = narrowest bar)
+EAN_QUIET_LEFT, EAN_QUIET_RIGHT = 11, 7
+EAN_BAR_TOP, EAN_BAR_BOTTOM, EAN_GUARD_BOTTOM = 74, 10, 5
+EAN_FONT_SIZE = 9
+EAN_WIDTH = EAN_QUIET_LEFT + 95 + EAN_QUIET_RIGHT
+
+# Printable code sizes: EAN-13 modules must stay within 80%-200% of the
+# nominal 0.33 mm, and truncated bars need at least 5 mm above the digits.
+# QR codes much under 10 mm don't scan with phone cameras.
+EAN_MIN_MODULE_MM, EAN_MAX_MODULE_MM = 0.8 * 0.33, 2 * 0.33
+EAN_MIN_BAR_MM = 5
+QR_MIN_SIDE_MM = 10
+QR_BORDER = 4  # Quiet zone around a QR code, in modules
+
+def ean13_check_digit(digits12):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits12))
+    return str((10 - total % 10) % 10)
+
+def ean13_value(value):
+    """Validate an EAN-13 value and return all 13 digits (check digit added if missing)"""
+    if not value.isdigit() or len(value) not in (12, 13):
+        raise ValueError(f"Neveljavna EAN-13 koda (potrebnih je 12 ali 13 številk): {value}")
+    check = ean13_check_digit(value[:12])
+    if len(value) == 13 and value[-1] != check:
+        raise ValueError(f"Napačna kontrolna številka EAN-13 kode: {value}")
+    return value[:12] + check
+
+def ean13_geometry(digits, bar_top=EAN_BAR_TOP):
+    """Bars and human-readable digits of an EAN-13 symbol, in module units (bars end at `bar_top`)"""
+    from reportlab.lib.colors import black
+
+    parity = EAN_PARITY[int(digits[0])]
+    modules = ('101'
+               + ''.join((EAN_L if p == 'L' else EAN_G)[int(d)] for p, d in zip(parity, digits[1:7]))
+               + '01010'
+               + ''.join(EAN_R[int(d)] for d in digits[7:])
+               + '101')
+
+    # Merge adjacent dark modules of the same height into one bar
+    bars = []
+    for i, bit in enumerate(modules):
+        if bit != '1':
+            continue
+        x = EAN_QUIET_LEFT + i
+        y = EAN_GUARD_BOTTOM if i in EAN_GUARDS else EAN_BAR_BOTTOM
+        if bars and bars[-1][0] + bars[-1][2] == x and bars[-1][1] == y:
+            bars[-1][2] += 1
+        else:
+            bars.append([x, y, 1, bar_top - y])
+
+    text_y = 2
+    left_centre = EAN_QUIET_LEFT + 3 + 21
+    right_centre = EAN_QUIET_LEFT + 50 + 21
+    strings = [
+        (black, 'Helvetica', EAN_FONT_SIZE, 'end', EAN_QUIET_LEFT - 2, text_y, digits[0]),
+        (black, 'Helvetica', EAN_FONT_SIZE, 'middle', left_centre, text_y, digits[1:7]),
+        (black, 'Helvetica', EAN_FONT_SIZE, 'middle', right_centre, text_y, digits[7:]),
+    ]
+    width = EAN_QUIET_LEFT + len(modules) + EAN_QUIET_RIGHT
+    return {black: [tuple(b) for b in bars]}, strings, width, bar_top
+
+def qr_geometry(value):
+    """Dark modules of a QR code as rects in module units, quiet zone included"""
+    from reportlab.lib.colors import black
+    from reportlab.graphics.barcode.qrencoder import QRCode, QRErrorCorrectLevel
+
+    if not value:
+        raise ValueError("Prazna QR koda")
+    # Same encoding as reportlab's QrCodeWidget, without its Rect node tree
+    qr = QRCode(None, QRErrorCorrectLevel.L)
+    qr.addData(value)
+    qr.make()
+    size = qr.getModuleCount() + 2 * QR_BORDER
+
+    # Horizontal runs of dark modules, extended downwards while the row
+    # below has the same run
+    rects, above = [], {}  # above: (x, width) -> index of the run in the row above
+    for r, row in enumerate(qr.modules):
+        y = size - QR_BORDER - 1 - r
+        current, x = {}, QR_BORDER
+        for dark, run in groupby(row):
+            w = len(list(run))
+            if dark:
+                i = above.get((x, w))
+                if i is None:
+                    i = len(rects)
+                    rects.append((x, y, w, 1))
+                else:
+                    rects[i] = (x, y, w, rects[i][3] + 1)
+                current[(x, w)] = i
+            x += w
+        above = current
+    return {black: rects}, [], size, size
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def code_geometry(kind, value, bar_top=EAN_BAR_TOP):
+    """Encode and vectorise a code once (`bar_top` truncates EAN-13 bars).
+
+    Returns (fills, strings, width, height) at natural size, with the origin at
+    the lower-left corner: fills is ((color, pdf_path_ops), ...) and strings is
+    ((color, font, size, x, y, text), ...) with x already resolved to the left edge.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    if kind == 'ean13':
+        fills, strings, width, height = ean13_geometry(ean13_value(value), bar_top)
+    elif kind == 'qr':
+        fills, strings, width, height = qr_geometry(value)
+    else:
+        raise ValueError(f"Neznana vrsta kode: {kind}")
+    # Pre-format each colour's rects as one filled PDF path
+    paths = tuple((color, ''.join('%g %g %g %g re\n' % r for r in rects) + 'f') for color, rects in fills.items())
+    left_aligned = []
+    for color, font, size, anchor, x, y, text in strings:
+        if anchor != 'start':
+            tw = stringWidth(text, font, size)
+            x -= tw / 2 if anchor == 'middle' else tw
+        left_aligned.append((color, font, size, x, y, text))
+    return paths, tuple(left_aligned), width, height
+
+def code_fit(kind, value, box_w, box_h):
+    """Fit a code into a box: returns (code_geometry result, scale).
+
+    EAN-13 fills the box width and shortens its bars to the box height
+    (truncated bars, as usual on shelf-edge labels); QR keeps its square.
+    Raises ValueError if the code would print too small to scan.
+    """
+    from reportlab.lib.units import mm
+
+    if kind == 'ean13':
+        ean13_value(value)  # Report an invalid code before a too small one
+        min_h = (EAN_MIN_BAR_MM + EAN_BAR_BOTTOM * EAN_MIN_MODULE_MM) * mm
+        if box_h < min_h:
+            raise ValueError(f"Premalo prostora za EAN-13 kodo {value} (višina {box_h / mm:.1f} mm, "
+                             f"najmanj {min_h / mm:.1f} mm) - zmanjšajte pisavo ali število vrstic")
+        # Geometry is in module units, so the scale is the module width. Shrink
+        # the symbol if that is what leaves the bars EAN_MIN_BAR_MM of height.
+        scale = min(box_w / EAN_WIDTH, EAN_MAX_MODULE_MM * mm, (box_h - EAN_MIN_BAR_MM * mm) / EAN_BAR_BOTTOM)
+        if scale < EAN_MIN_MODULE_MM * mm:
+            raise ValueError(f"Premalo prostora za EAN-13 kodo {value} (modul {scale / mm:.2f} mm, "
+                             f"najmanj {EAN_MIN_MODULE_MM:.2f} mm) - zmanjšajte pisavo ali število vrstic")
+        return code_geometry(kind, value, min(EAN_BAR_TOP, box_h / scale)), scale
+
+    geometry = code_geometry(kind, value)
+    nat_w, nat_h = geometry[2], geometry[3]
+    scale = min(box_w / nat_w, box_h / nat_h)
+    if min(nat_w, nat_h) * scale < QR_MIN_SIDE_MM * mm:
+        raise ValueError(f"Premalo prostora za QR kodo {value} (stranica {min(nat_w, nat_h) * scale / mm:.1f} mm, "
+                         f"najmanj {QR_MIN_SIDE_MM} mm) - zmanjšajte pisavo ali število vrstic")
+    return geometry, scale
+
+class CodeForms:
+    """Per-canvas code drawing: repeated codes become one PDF form XObject reused on every label"""
+
+    def __init__(self, c, labels):
+        self.c = c
+        # Only codes used on more than one label are worth a form of their own
+        counts = Counter(code for label in labels for code in map(parse_code_line, label) if code)
+        self.repeated = {code for code, n in counts.items() if n > 1}
+        self.forms = {}  # (kind, value, box_w, box_h) -> (form name, width, height)
+        self.hits = 0
+        self.misses = 0
+        self.inline = 0  # Single-use codes drawn straight into the page
+
+    def draw(self, kind, value, x, y, box_w, box_h):
+        """Draw a code scaled to fit and centred in the box with lower-left corner (x, y)"""
+        c = self.c
+        if (kind, value) not in self.repeated:
+            self.inline += 1
+            (fills, strings, nat_w, nat_h), scale = code_fit(kind, value, box_w, box_h)
+            c.saveState()
+            c.transform(scale, 0, 0, scale, x + (box_w - nat_w * scale) / 2, y + (box_h - nat_h * scale) / 2)
+            self._draw_geometry(fills, strings)
+            c.restoreState()
+            return
+
+        key = (kind, value, round(box_w, 2), round(box_h, 2))
+        form = self.forms.get(key)
+        if form is None:
+            self.misses += 1
+            form = self.forms[key] = self._make_form(kind, value, box_w, box_h)
+        else:
+            self.hits += 1
+        name, w, h = form
+
+        c.saveState()
+        c.translate(x + (box_w - w) / 2, y + (box_h - h) / 2)
+        c.doForm(name)
+        c.restoreState()
+
+    def _make_form(self, kind, value, box_w, box_h):
+        (fills, strings, nat_w, nat_h), scale = code_fit(kind, value, box_w, box_h)
+        name = f"Code{len(self.forms)}"
+
+        self.c.beginForm(name)
+        self.c.scale(scale, scale)
+        self._draw_geometry(fills, strings)
+        self.c.endForm()
+        return name, nat_w * scale, nat_h * scale
+
+    def _draw_geometry(self, fills, strings):
+        c = self.c
+        for color, path_ops in fills:
+            c.setFillColor(color)
+            c.addLiteral(path_ops)
+        if strings:
+            # One text object for all of the code's strings
+            t = c.beginText()
+            current = None
+            for color, font, size, x, y, text in strings:
+                if (color, font, size) != current:
+                    current = (color, font, size)
+                    t.setFillColor(color)
+                    t.setFont(font, size)
+                t.setTextOrigin(x, y)
+                t.textOut(text)
+            c.drawText(t)
@@ -0,0 +1,258 @@
+from pathlib import Path
+import os
+
+from barcodes import CodeForms, code_geometry, parse_code_line
+from telemetry import JobTelemetry
+
+# Tk-free label rendering shared by the GUI (labels.py), render_server.py and
+# watch_folder.py, so the service and daemon also run on Python builds without Tk.
+
+def split_labels(text, lines_per_label):
+    """Split raw input text into labels of `lines_per_label` lines each"""
+    lines = [l.rstrip() for l in text.split("\n")]  # Keep empty lines, only strip trailing whitespace
+    n = lines_per_label
+    return [lines[i:i+n] for i in range(0, len(lines), n)]
+
+def csv_delimiter(text):
+    """Guess the CSV delimiter (";", "," or tab) that splits every line into the same number of columns"""
+    import csv, io
+
+    try:
+        sniffed = [csv.Sniffer().sniff(text[:8192], ';,\t').delimiter]
+    except csv.Error:
+        sniffed = []
+    # Excel in comma-decimal locales (e.g. "1,19 EUR") exports with ";"
+    for delimiter in dict.fromkeys(sniffed + [';', '\t', ',']):
+        widths = {len(row) for row in csv.reader(io.StringIO(text, newline=''), delimiter=delimiter) if row}
+        if len(widths) == 1 and widths.pop() > 1:
+            return delimiter
+    # A single column: ";" and "," are part of the values. The ASCII unit
+    # separator never occurs in exported text, so quoting still works.
+    return '\x1f'
+
+def read_label_file(filename):
+    """Read label lines from the first column of an Excel or CSV file (empty cells skipped)"""
+    if Path(filename).suffix.lower() == '.csv':
+        import csv, io
+        raw = Path(filename).read_bytes()
+        try:
+            text = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            # Excel on Slovenian Windows saves CSV as cp1250
+            text = raw.decode('cp1250')
+        reader = csv.reader(io.StringIO(text, newline=''), delimiter=csv_delimiter(text))
+        return [row[0].strip() for row in reader if row and row[0] != '']
+
+    # Lazy import openpyxl only when needed
+    import openpyxl
+    workbook = openpyxl.load_workbook(filename, data_only=True)
+    sheet = workbook.active
+    
+    # Extract data from first column (skip empty cells)
+    data = []
+    for row in sheet.iter_rows(min_row=1, min_col=1, max_col=1):
+        cell_value = row[0].value
+        if cell_value is not None:
+            # Convert to string and strip whitespace
+            data.append(str(cell_value).strip())
+    return data
+
+class LabelRenderer:
+    """Headless Avery 3658 PDF renderer (no Tk needed)"""
+
+    # 🗂 Font file map for PDF (regular and bold)
+    font_map = {
+        "Arial": [["arial.ttf", "ARIAL.TTF"], ["arialbd.ttf", "ARIALBD.TTF"]],
+        "Arial Narrow": [["arialn.ttf", "ARIALN.TTF"], ["arialnb.ttf", "ARIALNB.TTF"]],
+        "Helvetica": [["arial.ttf", "ARIAL.TTF"], ["arialbd.ttf", "ARIALBD.TTF"]],
+        "Times New Roman": [["times.ttf", "TIMES.TTF"], ["timesbd.ttf", "TIMESBD.TTF"]],
+        "Courier New": [["cour.ttf", "COUR.TTF"], ["courbd.ttf", "COURBD.TTF"]]
+    }
+
+    # Fonts are registered globally in reportlab, so once per process is enough
+    _fonts_registered = False
+
+    def __init__(self, font_name="Arial", font_size=18, bold=False, h_padding=2, left_extra=0, right_extra=0):
+        # Lazy import reportlab units
+        from reportlab.lib.units import mm
+        self.mm = mm
+
+        if font_name not in self.font_map:
+            raise ValueError(f"Neznana pisava: {font_name} (na voljo: {', '.join(self.font_map)})")
+        self.font_name = font_name
+        self.font_size = font_size
+        self.bold = bold
+        self.h_padding = h_padding        # mm from left/right edges
+        self.left_extra = left_extra      # Extra left padding for left column (mm)
+        self.right_extra = right_extra    # Extra right padding for right column (mm)
+
+        # Avery 3658 specs
+        self.label_width = 64.6 * mm
+        self.label_height = 33.8 * mm
+        self.cols, self.rows = 3, 8
+        self.col_gap, self.row_gap = 0 * mm, 0 * mm  # Labels touch - no physical gap
+        # Calculate left margin: (A4 width - 3 labels) / 2 = (210mm - 3*64.6mm) / 2 = 8.1mm
+        self.left_margin = (210 * mm - 3 * self.label_width) / 2
+        self.top_margin = 13.5 * mm
+        self.code_v_padding = 1.5 * mm  # Gap above/below barcode and QR lines
+
+    @classmethod
+    def register_fonts_for_pdf(cls):
+        """Try to register available TTF fonts for PDF use (regular and bold)"""
+        if cls._fonts_registered:
+            return
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        
+        search_paths = [
+            "C:\\Windows\\Fonts",
+            "/usr/share/fonts",
+            "/usr/local/share/fonts",
+            str(Path.home() / ".fonts")
+        ]
+        for name, font_variants in cls.font_map.items():
+            # Register regular font
+            for sp in search_paths:
+                for f in font_variants[0]:
+                    path = Path(sp) / f
+                    if path.exists():
+                        try:
+                            pdfmetrics.registerFont(TTFont(name, str(path)))
+                        except:
+                            pass
+                        break
+            # Register bold font
+            for sp in search_paths:
+                for f in font_variants[1]:
+                    path = Path(sp) / f
+                    if path.exists():
+                        try:
+                            pdfmetrics.registerFont(TTFont(f"{name}-Bold", str(path)))
+                        except:
+                            pass
+                        break
+        cls._fonts_registered = True
+
+    def check_font_installed(self):
+        """Raise a readable error if the selected font's TTF file was not found"""
+        from reportlab.pdfbase import pdfmetrics
+
+        actual_font_name = f"{self.font_name}-Bold" if self.bold else self.font_name
+        try:
+            pdfmetrics.getFont(actual_font_name)
+        except KeyError:
+            raise ValueError(f"Pisava {actual_font_name} ni nameščena na tem računalniku") from None
+
+    def create_pdf(self, filename, labels, lines_per_label, telemetry=None):
+        """Render labels to `filename` (a path or a writable file object such as BytesIO)"""
+        tm = telemetry or JobTelemetry('pdf')
+
+        # Lazy import reportlab only when generating PDF
+        from reportlab.pdfgen import canvas
+        from reportlab.lib.pagesizes import A4
+        
+        # Lazy load fonts only when generating PDF (not at startup)
+        fonts_cached = LabelRenderer._fonts_registered
+        with tm.stage('fonts'):
+            self.register_fonts_for_pdf()
+        tm.cache('fonts', hits=int(fonts_cached), misses=int(not fonts_cached))
+        self.check_font_installed()
+        
+        with tm.stage('canvas'):
+            c = canvas.Canvas(filename, pagesize=A4)
+        self.code_forms = CodeForms(c, labels)
+        codes_before = code_geometry.cache_info()
+        per_page = self.cols * self.rows
+        with tm.stage('layout'):
+            for page_start in range(0, len(labels), per_page):
+                if page_start > 0: c.showPage()
+                for idx, label_lines in enumerate(labels[page_start:page_start + per_page]):
+                    row, col = divmod(idx, self.cols)
+                    x = self.left_margin + col * (self.label_width + self.col_gap)
+                    y = A4[1] - self.top_margin - (row + 1) * self.label_height - row * self.row_gap
+                    self.draw_label(c, x, y, label_lines, lines_per_label, self.font_name, self.bold, col)
+        with tm.stage('save'):
+            c.save()
+
+        if self.code_forms.hits or self.code_forms.misses or self.code_forms.inline:
+            codes_after = code_geometry.cache_info()
+            tm.cache('codes', hits=codes_after.hits - codes_before.hits, misses=codes_after.misses - codes_before.misses)
+            tm.cache('code_forms', hits=self.code_forms.hits, misses=self.code_forms.misses)
+            tm.count('codes_inline', self.code_forms.inline)
+
+        tm.count('labels', len(labels))
+        tm.count('pages', -(-len(labels) // per_page))
+        tm.count('bytes', filename.tell() if hasattr(filename, 'tell') else os.path.getsize(filename))
+
+    def draw_label(self, c, x, y, lines, max_lines, font_name, use_bold=False, col=1):
+        mm = self.mm
+        actual_font_name = f"{font_name}-Bold" if use_bold else font_name
+        
+        # Use fixed font size from settings (no auto-resize)
+        size = self.font_size
+        line_h = size * 1.2
+        total_h = len(lines) * line_h
+        
+        # Calculate padding - this defines the "safe area" within the label
+        base_padding = self.h_padding * mm
+        left_pad = base_padding
+        right_pad = base_padding
+        
+        # Add column-specific extra padding
+        if col == 0:  # Left column
+            left_pad += self.left_extra * mm
+        elif col == 2:  # Right column
+            right_pad += self.right_extra * mm
+        
+        # Calculate the safe area width after padding
+        safe_width = self.label_width - left_pad - right_pad
+        
+        codes = [parse_code_line(line) for line in lines]
+        if any(codes):
+            self.draw_mixed_lines(c, x, y, lines, codes, actual_font_name, size, left_pad, safe_width)
+            return
+        
+        # Center text vertically
+        start_y = y + (self.label_height - total_h) / 2
+        
+        # Draw each line, centered within the safe area
+        for i, line in enumerate(lines):
+            ty = start_y + (len(lines)-1-i) * line_h
+            tw = c.stringWidth(line, actual_font_name, size)
+            
+            # Position text: start from label left edge + left padding, 
+            # then center within the safe width
+            tx = x + left_pad + (safe_width - tw) / 2
+            
+            c.setFont(actual_font_name, size)
+            c.drawString(tx, ty, line)
+
+    def code_height(self, lines, codes):
+        """Height of each barcode/QR line: codes share what the text lines leave of the label"""
+        n_codes = sum(1 for code in codes if code)
+        text_h = (len(lines) - n_codes) * self.font_size * 1.2
+        code_h = (self.label_height - 2 * self.code_v_padding - text_h) / n_codes
+        if code_h <= 0:
+            first = next(line for line, code in zip(lines, codes) if code)
+            raise ValueError(f"Na nalepki ni prostora za kodo {first} - zmanjšajte pisavo ali število vrstic")
+        return code_h
+
+    def draw_mixed_lines(self, c, x, y, lines, codes, font_name, size, left_pad, safe_width):
+        """Draw a label mixing text lines with barcode/QR lines (codes come from parse_code_line)"""
+        line_h = size * 1.2
+        n_codes = sum(1 for code in codes if code)
+        code_h = self.code_height(lines, codes)
+        total_h = (len(lines) - n_codes) * line_h + n_codes * code_h
+        
+        # Center the whole block vertically, then stack lines from the top
+        top = y + (self.label_height + total_h) / 2
+        for line, code in zip(lines, codes):
+            if code:
+                top -= code_h
+                self.code_forms.draw(code[0], code[1], x + left_pad, top, safe_width, code_h)
+            else:
+                top -= line_h
+                tw = c.stringWidth(line, font_name, size)
+                c.setFont(font_name, size)
+                # Keep descenders inside the line so they don't touch a code below
+                c.drawString(x + left_pad + (safe_width - tw) / 2, top + line_h - size, line)
@@ -5,6 +5,10 @@ import hashlib, json, base64
 from pathlib import Path
 import os
 
+from barcodes import code_fit, code_geometry, parse_code_line
+from label_renderer import LabelRenderer, read_label_file, split_labels
+from telemetry import JobTelemetry
+
 # Heavy imports - lazy load only when needed
 # from reportlab.lib.units import mm
 # from reportlab.pdfgen import canvas
@@ -109,10 +113,6 @@ class RegistrationDialog:
 
 class LabelPrinterApp:
     def __init__(self, root):
-        # Import reportlab units here (lazy load)
-        from reportlab.lib.units import mm
-        global mm  # Make it available to other methods
-        
         self.root = root
         self.root.title("Tiskalnik Nalepk - Avery 3658")
         self.root.geometry("750x800")
@@ -122,29 +122,8 @@ class LabelPrinterApp:
             return
 
         # 🎨 Available fonts
-        self.available_fonts = ["Arial", "Arial Narrow", "Helvetica", "Times New Roman", "Courier New"]
-
-        # 🗂 Font file map for PDF (regular and bold)
-        self.font_map = {
-            "Arial": [["arial.ttf", "ARIAL.TTF"], ["arialbd.ttf", "ARIALBD.TTF"]],
-            "Arial Narrow": [["arialn.ttf", "ARIALN.TTF"], ["arialnb.ttf", "ARIALNB.TTF"]],
-            "Helvetica": [["arial.ttf", "ARIAL.TTF"], ["arialbd.ttf", "ARIALBD.TTF"]],
-            "Times New Roman": [["times.ttf", "TIMES.TTF"], ["timesbd.ttf", "TIMESBD.TTF"]],
-            "Courier New": [["cour.ttf", "COUR.TTF"], ["courbd.ttf", "COURBD.TTF"]]
-        }
-
-        # Register fonts for PDF if found
-        self._fonts_registered = False  # Lazy load fonts only when needed
-
-        # Avery 3658 specs
-        self.label_width = 64.6 * mm
-        self.label_height = 33.8 * mm
-        self.cols, self.rows = 3, 8
-        self.col_gap, self.row_gap = 0 * mm, 0 * mm  # Labels touch - no physical gap
-        # Calculate left margin: (A4 width - 3 labels) / 2 = (210mm - 3*64.6mm) / 2 = 8.1mm
-        self.left_margin = (210 * mm - 3 * self.label_width) / 2
-        self.top_margin = 13.5 * mm
-        
+        self.available_fonts = list(LabelRenderer.font_map)
+
         # Font settings
         self.lines_var = tk.IntVar(value=3)
         self.font_var = tk.StringVar(value="Arial")
@@ -160,38 +139,16 @@ class LabelPrinterApp:
 
         self.create_widgets()
 
-    def register_fonts_for_pdf(self):
-        """Try to register available TTF fonts for PDF use (regular and bold)"""
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        
-        search_paths = [
-            "C:\\Windows\\Fonts",
-            "/usr/share/fonts",
-            "/usr/local/share/fonts",
-            str(Path.home() / ".fonts")
-        ]
-        for name, font_variants in self.font_map.items():
-            # Register regular font
-            for sp in search_paths:
-                for f in font_variants[0]:
-                    path = Path(sp) / f
-                    if path.exists():
-                        try:
-                            pdfmetrics.registerFont(TTFont(name, str(path)))
-                        except:
-                            pass
-                        break
-            # Register bold font
-            for sp in search_paths:
-                for f in font_variants[1]:
-                    path = Path(sp) / f
-                    if path.exists():
-                        try:
-                            pdfmetrics.registerFont(TTFont(f"{name}-Bold", str(path)))
-                        except:
-                            pass
-                        break
+    def get_renderer(self):
+        """Build a PDF renderer from the current GUI settings"""
+        return LabelRenderer(
+            font_name=self.font_var.get(),
+            font_size=self.font_size_var.get(),
+            bold=self.bold_var.get(),
+            h_padding=self.universal_h_padding.get(),
+            left_extra=self.left_col_extra_padding.get(),
+            right_extra=self.right_col_extra_padding.get()
+        )
 
     def check_license(self):
         license_data = self.license_mgr.load_license()
@@ -317,9 +274,8 @@ class LabelPrinterApp:
             messagebox.showwarning("Ni podatkov", "Najprej vnesite ali prilepite podatke za nalepke, ali uvozite iz Excela.")
             return
         
-        lines = [l.rstrip() for l in text.split("\n")]
         n = self.lines_var.get()
-        labels = [lines[i:i+n] for i in range(0, len(lines), n)]
+        labels = split_labels(text, n)
         
         if not labels:
             messagebox.showwarning("Ni Podatkov", "Ni veljavnih podatkov za tiskanje")
@@ -402,11 +358,14 @@ class LabelPrinterApp:
             temp_pdf.close()
             
             try:
-                self.create_pdf(temp_filename, labels, lines_per_label)
+                tm = JobTelemetry('print')
+                self.create_pdf(temp_filename, labels, lines_per_label, tm)
                 
                 # Print to selected printer
-                win32print.SetDefaultPrinter(selected_printer)
-                os.startfile(temp_filename, 'print')
+                with tm.stage('print'):
+                    win32print.SetDefaultPrinter(selected_printer)
+                    os.startfile(temp_filename, 'print')
+                tm.write()
                 
                 # Restore original default printer after a short delay
                 self.root.after(2000, lambda: win32print.SetDefaultPrinter(default_printer) if default_printer != selected_printer else None)
@@ -431,8 +390,11 @@ class LabelPrinterApp:
         temp_pdf.close()
         
         try:
-            self.create_pdf(temp_filename, labels, lines_per_label)
-            subprocess.run(['lp', temp_filename])
+            tm = JobTelemetry('print')
+            self.create_pdf(temp_filename, labels, lines_per_label, tm)
+            with tm.stage('print'):
+                subprocess.run(['lp', temp_filename])
+            tm.write()
             messagebox.showinfo("Tiskanje", "Dokument poslan na tiskalnik.")
         except Exception as e:
             messagebox.showerror("Napaka pri Tiskanju", f"Napaka:\n\n{str(e)}")
@@ -464,33 +426,29 @@ class LabelPrinterApp:
         )
 
     def import_from_excel(self):
-        """Import data from Excel file (first column only)"""
-        # Lazy import openpyxl only when needed
-        try:
-            import openpyxl
-        except ImportError:
-            messagebox.showerror("Manjkajoča Knjižnica", "openpyxl ni nameščen. Namestite z: pip install openpyxl")
-            return
-        
+        """Import data from Excel or CSV file (first column only)"""
         filename = filedialog.askopenfilename(
             title="Izberi Excel Datoteko",
-            filetypes=[("Excel Datoteke", "*.xlsx *.xls"), ("Vse Datoteke", "*.*")]
+            filetypes=[("Excel Datoteke", "*.xlsx *.xls"), ("CSV Datoteke", "*.csv"), ("Vse Datoteke", "*.*")]
         )
         
         if not filename:
             return
         
+        # Lazy import openpyxl only when needed - CSV files are read without it
+        if Path(filename).suffix.lower() != '.csv':
+            try:
+                import openpyxl
+            except ImportError:
+                messagebox.showerror("Manjkajoča Knjižnica", "openpyxl ni nameščen. Namestite z: pip install openpyxl")
+                return
+        
         try:
-            workbook = openpyxl.load_workbook(filename, data_only=True)
-            sheet = workbook.active
-            
-            # Extract data from first column (skip empty cells)
-            data = []
-            for row in sheet.iter_rows(min_row=1, min_col=1, max_col=1):
-                cell_value = row[0].value
-                if cell_value is not None:
-                    # Convert to string and strip whitespace
-                    data.append(str(cell_value).strip())
+            tm = JobTelemetry('import')
+            with tm.stage('file_parse'):
+                data = read_label_file(filename)
+            tm.count('lines', len(data))
+            tm.write()
             
             if not data:
                 messagebox.showwarning("Ni Podatkov", "V prvem stolpcu Excel datoteke ni podatkov.")
@@ -574,16 +532,21 @@ class LabelPrinterApp:
             # Calculate safe width
             safe_w = label_w - left_pad - right_pad
             
-            # Draw text lines
-            text_y = start_y + label_h / 2 - (len(text_lines) - 1) * font_size * 0.6
-            for line in text_lines:
-                self.preview_canvas.create_text(
-                    x + left_pad + safe_w / 2, text_y,
-                    text=line,
-                    font=(font_name, max(6, int(font_size * 0.8)), font_weight),
-                    fill="black"
-                )
-                text_y += font_size * 1.2 * 0.8
+            codes = [parse_code_line(line) for line in text_lines]
+            if any(codes):
+                self.draw_preview_codes(x + left_pad, start_y, safe_w, text_lines, codes,
+                                        (font_name, max(6, int(font_size * 0.8)), font_weight), scale)
+            else:
+                # Draw text lines
+                text_y = start_y + label_h / 2 - (len(text_lines) - 1) * font_size * 0.6
+                for line in text_lines:
+                    self.preview_canvas.create_text(
+                        x + left_pad + safe_w / 2, text_y,
+                        text=line,
+                        font=(font_name, max(6, int(font_size * 0.8)), font_weight),
+                        fill="black"
+                    )
+                    text_y += font_size * 1.2 * 0.8
             
             # Label indicator
             self.preview_canvas.create_text(
@@ -593,14 +556,64 @@ class LabelPrinterApp:
                 fill="gray"
             )
 
+    def draw_preview_codes(self, x, y, safe_w, text_lines, codes, font, scale):
+        """Preview a label with barcode/QR lines: same layout and size checks as the PDF, codes drawn as boxes"""
+        from reportlab.lib.units import mm
+        
+        renderer = self.get_renderer()
+        px = scale / mm  # Preview pixels per PDF point
+        line_h = renderer.font_size * 1.2
+        try:
+            code_h = renderer.code_height(text_lines, codes)
+        except ValueError:
+            code_h = None
+        n_codes = sum(1 for code in codes if code)
+        total_h = (len(text_lines) - n_codes) * line_h + n_codes * (code_h or line_h)
+        cx = x + safe_w / 2
+        top = y + max(0, renderer.label_height - total_h) / 2 * px  # Overflowing labels start at the top
+        
+        for line, code in zip(text_lines, codes):
+            if not code:
+                self.preview_canvas.create_text(cx, top + line_h * px / 2, text=line, font=font, fill="black")
+                top += line_h * px
+                continue
+            slot_h = (code_h or line_h) * px
+            try:
+                code_geometry(*code)
+            except ValueError:
+                problem = "Neveljavna koda"
+            else:
+                problem = "Ni prostora za kodo"
+                if code_h is not None:
+                    try:
+                        (_, _, nat_w, nat_h), s = code_fit(code[0], code[1], safe_w / px, code_h)
+                        problem = None
+                    except ValueError:
+                        pass
+            if problem:
+                # "Generiraj PDF" refuses this label with the full reason
+                self.preview_canvas.create_text(cx, top + slot_h / 2, text=problem, font=("Arial", 8), fill="red")
+            else:
+                w, h = nat_w * s * px, nat_h * s * px
+                self.preview_canvas.create_rectangle(
+                    cx - w / 2, top + (slot_h - h) / 2, cx + w / 2, top + (slot_h + h) / 2,
+                    outline="gray", fill="#eeeeee", dash=(3, 2)
+                )
+                self.preview_canvas.create_text(
+                    cx, top + slot_h / 2,
+                    text="QR" if code[0] == 'qr' else "EAN-13",
+                    font=("Arial", 8),
+                    fill="gray"
+                )
+            top += slot_h
+
     def generate_labels(self):
         text = self.text_input.get("1.0", "end").strip()
         if not text:
             messagebox.showwarning("Ni podatkov", "Najprej vnesite ali prilepite podatke za nalepke, ali uvozite iz Excela.")
             return
-        lines = [l.rstrip() for l in text.split("\n")]  # Keep empty lines, only strip trailing whitespace
         n = self.lines_var.get()
-        labels = [lines[i:i+n] for i in range(0, len(lines), n)]
+        labels = split_labels(text, n)
         if not labels:
             messagebox.showwarning("Ni Podatkov", "Ni veljavnih podatkov za tiskanje")
             return
@@ -608,69 +621,15 @@ class LabelPrinterApp:
             filetypes=[("PDF", "*.pdf")], initialfile=f"nalepke_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
         if not filename: return
         try:
-            self.create_pdf(filename, labels, n)
+            tm = JobTelemetry('generate')
+            self.create_pdf(filename, labels, n, tm)
+            tm.write()
             messagebox.showinfo("Uspeh", f"PDF shranjen: {filename}")
         except Exception as e:
             messagebox.showerror("Napaka", str(e))
 
-    def create_pdf(self, filename, labels, lines_per_label):
-        # Lazy import reportlab only when generating PDF
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import A4
-        
-        # Lazy load fonts only when generating PDF (not at startup)
-        if not self._fonts_registered:
-            self.register_fonts_for_pdf()
-            self._fonts_registered = True
-        
-        c = canvas.Canvas(filename, pagesize=A4)
-        font_name = self.font_var.get()
-        use_bold = self.bold_var.get()
-        for page_start in range(0, len(labels), self.cols * self.rows):
-            if page_start > 0: c.showPage()
-            for idx, label_lines in enumerate(labels[page_start:page_start + self.cols*self.rows]):
-                row, col = divmod(idx, self.cols)
-                x = self.left_margin + col * (self.label_width + self.col_gap)
-                y = A4[1] - self.top_margin - (row + 1) * self.label_height - row * self.row_gap
-                self.draw_label(c, x, y, label_lines, lines_per_label, font_name, use_bold, col)
-        c.save()
-
-    def draw_label(self, c, x, y, lines, max_lines, font_name, use_bold=False, col=1):
-        actual_font_name = f"{font_name}-Bold" if use_bold else font_name
-        
-        # Use fixed font size from GUI (no auto-resize)
-        size = self.font_size_var.get()
-        line_h = size * 1.2
-        total_h = len(lines) * line_h
-        
-        # Calculate padding - this defines the "safe area" within the label
-        base_padding = self.universal_h_padding.get() * mm
-        left_pad = base_padding
-        right_pad = base_padding
-        
-        # Add column-specific extra padding
-        if col == 0:  # Left column
-            left_pad += self.left_col_extra_padding.get() * mm
-        elif col == 2:  # Right column
-            right_pad += self.right_col_extra_padding.get() * mm
-        
-        # Calculate the safe area width after padding
-        safe_width = self.label_width - left_pad - right_pad
-        
-        # Center text vertically
-        start_y = y + (self.label_height - total_h) / 2
-        
-        # Draw each line, centered within the safe area
-        for i, line in enumerate(lines):
-            ty = start_y + (len(lines)-1-i) * line_h
-            tw = c.stringWidth(line, actual_font_name, size)
-            
-            # Position text: start from label left edge + left padding, 
-            # then center within the safe width
-            tx = x + left_pad + (safe_width - tw) / 2
-            
-            c.setFont(actual_font_name, size)
-            c.drawString(tx, ty, line)
+    def create_pdf(self, filename, labels, lines_per_label, telemetry=None):
+        self.get_renderer().create_pdf(filename, labels, lines_per_label, telemetry)
 
     def calculate_font_size(self, lines, max_w, max_h, max_lines, font_name):
         base = {1:32, 2:24, 3:18, 4:14, 5:12, 6:10}
@@ -0,0 +1,289 @@
+import argparse, json, os, queue, socketserver, threading, time
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from label_renderer import LabelRenderer, split_labels
+from telemetry import JobTelemetry
+
+# Local render service: POST /render with a JSON job, get a PDF back.
+#
+#   {"text": "line1\nline2\nline3", "lines_per_label": 3,
+#    "settings": {"font_name": "Arial", "font_size": 18, "bold": false,
+#                 "h_padding": 2, "left_extra": 0, "right_extra": 0}}
+#
+# Instead of "text", a job may send "labels": [["line1", "line2"], ...].
+# Failures return {"error": "..."} with 400 for a bad job, 413 for an oversized
+# body, 503 when the font isn't installed on the server, 504 on a render
+# timeout and 500 when a worker fails.
+# Worker processes import reportlab and register fonts once at startup,
+# so requests only pay for layout and c.save().
+
+LABELS_PER_PAGE = 3 * 8  # Avery 3658
+MAX_BODY_BYTES = 16 * 1024 * 1024  # Largest accepted job (~100k labels)
+
+class RenderError(Exception):
+    """A job failure carrying the HTTP status to report it with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def warm_worker():
+    """Pool initializer - import reportlab and register fonts once per worker"""
+    from reportlab.pdfgen import canvas  # noqa: F401 (warm the import)
+    LabelRenderer.register_fonts_for_pdf()
+
+def job_labels(job):
+    """Return (labels, lines_per_label) for a JSON job"""
+    n = int(job.get('lines_per_label', 3))
+    if n < 1:
+        raise ValueError("lines_per_label must be at least 1")
+    if 'labels' in job:
+        labels = job['labels']
+        if not isinstance(labels, list) or not all(isinstance(label, list) for label in labels):
+            raise ValueError('"labels" must be a list of lists of lines')
+        labels = [[str(l) for l in label] for label in labels]
+    else:
+        text = str(job.get('text', '')).strip()
+        labels = split_labels(text, n) if text else []
+    if not labels:
+        raise ValueError("No label data")
+    return labels, n
+
+def job_settings(job):
+    """Return validated LabelRenderer keyword arguments for a JSON job"""
+    settings = job.get('settings', {})
+    if not isinstance(settings, dict):
+        raise ValueError('"settings" must be a JSON object')
+    allowed = ('font_name', 'font_size', 'bold', 'h_padding', 'left_extra', 'right_extra')
+    unknown = sorted(set(settings) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(unknown)} (allowed: {', '.join(allowed)})")
+    font_name = settings.get('font_name', 'Arial')
+    if font_name not in LabelRenderer.font_map:
+        raise ValueError(f"Unknown font {font_name!r} (available: {', '.join(LabelRenderer.font_map)})")
+    if not isinstance(settings.get('bold', False), bool):
+        raise ValueError('"bold" must be true or false')
+    for key in ('font_size', 'h_padding', 'left_extra', 'right_extra'):
+        if key not in settings:
+            continue
+        value = settings[key]
+        # bool is an int subclass, but "font_size": true is not a size
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f'"{key}" must be a number')
+        if value < 0 or (key == 'font_size' and value == 0):
+            raise ValueError(f'"{key}" must be {"positive" if key == "font_size" else "zero or more"}')
+    return settings
+
+def render_job(job):
+    """Render one job; returns (pdf_bytes, exported worker telemetry)"""
+    labels, n = job_labels(job)
+    renderer = LabelRenderer(**job_settings(job))
+    try:
+        renderer.check_font_installed()
+    except ValueError as e:
+        # The job asked for a valid font this server doesn't have installed
+        raise RenderError(503, str(e)) from None
+    buf = BytesIO()
+    tm = JobTelemetry('render')
+    renderer.create_pdf(buf, labels, n, tm)
+    return buf.getvalue(), tm.export()
+
+def render_batch(jobs):
+    """Render several jobs in one worker round-trip; returns [(ok, render_job result or (status, error))]"""
+    results = []
+    for job in jobs:
+        try:
+            results.append((True, render_job(job)))
+        except RenderError as e:
+            results.append((False, (e.status, str(e))))
+        except ValueError as e:
+            # Bad label data, e.g. an invalid EAN-13 or a code that doesn't fit
+            results.append((False, (400, str(e))))
+        except Exception as e:
+            results.append((False, (500, f"Render failed: {type(e).__name__}: {e}")))
+    return results
+
+class RenderPool:
+    """Pool of font-warmed worker processes that batches small jobs together"""
+
+    def __init__(self, workers=None, batch_size=8, batch_window=0.005):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window  # seconds to wait for more small jobs
+        self.pool = multiprocessing.Pool(self.workers, initializer=warm_worker)
+        self.pending = queue.Queue()
+        threading.Thread(target=self._batcher, daemon=True).start()
+
+    def submit(self, job):
+        """Queue a job; returns a Future resolving to (pdf_bytes, worker telemetry)"""
+        future = Future()
+        try:
+            job_settings(job)
+            small = len(job_labels(job)[0]) <= LABELS_PER_PAGE
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        if small:
+            self.pending.put((job, future))
+        else:
+            # Multi-page jobs gain nothing from batching - send them straight to a worker
+            self._dispatch([(job, future)])
+        return future
+
+    def render(self, job, timeout=None, telemetry=None):
+        """Render a job and return PDF bytes, merging the worker's stage timings into `telemetry`"""
+        if telemetry is None:
+            return self.submit(job).result(timeout)[0]
+        with telemetry.stage('render'):
+            pdf, worker_telemetry = self.submit(job).result(timeout)
+        telemetry.merge(worker_telemetry)
+        return pdf
+
+    def _batcher(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        futures = [f for _, f in batch]
+
+        def done(results):
+            for future, (ok, payload) in zip(futures, results):
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RenderError(*payload))
+
+        def failed(exc):
+            for future in futures:
+                future.set_exception(RenderError(500, f"Render worker failed: {type(exc).__name__}: {exc}"))
+
+        self.pool.apply_async(render_batch, ([job for job, _ in batch],), callback=done, error_callback=failed)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+class RenderHandler(BaseHTTPRequestHandler):
+    render_pool = None
+    timeout_s = 60
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        self.send_json(200, {'status': 'ok', 'workers': self.render_pool.workers})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.send_json(400, {'error': 'Invalid Content-Length'})
+            return
+        if length < 0 or length > MAX_BODY_BYTES:
+            self.close_connection = True  # The unread body can't be skipped
+            self.send_json(413, {'error': f'Request body must be at most {MAX_BODY_BYTES} bytes'})
+            return
+        try:
+            job = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(job, dict):
+                raise ValueError("Job must be a JSON object")
+            tm = JobTelemetry('render')
+            pdf = self.render_pool.render(job, timeout=self.timeout_s, telemetry=tm)
+        except FutureTimeout:
+            self.send_json(504, {'error': f'Render timed out after {self.timeout_s:g} s'})
+            return
+        except RenderError as e:
+            self.send_json(e.status, {'error': str(e)})
+            return
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        tm.write()
+        self.send_response(200)
+        self.send_header('X-Job-Id', tm.job_id)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(pdf)))
+        self.end_headers()
+        self.wfile.write(pdf)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if self.client_address else 'local'
+
+# socketserver's default listen backlog of 5 resets connections as soon as a
+# few terminals submit at once
+REQUEST_QUEUE_SIZE = 128
+
+class RenderHTTPServer(ThreadingHTTPServer):
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        request_queue_size = REQUEST_QUEUE_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description="Local label render service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-window-ms', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=60, help="Per-request render timeout (s)")
+    args = parser.parse_args()
+    if args.socket and not hasattr(socketserver, 'UnixStreamServer'):
+        parser.error("--socket needs Unix socket support, which this platform does not have")
+
+    pool = RenderPool(args.workers, args.batch_size, args.batch_window_ms / 1000)
+    RenderHandler.render_pool = pool
+    RenderHandler.timeout_s = args.timeout
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, RenderHandler)
+        where = args.socket
+    else:
+        server = RenderHTTPServer((args.host, args.port), RenderHandler)
+        where = f"http://{args.host}:{args.port}"
+
+    print(f"Render service listening on {where} ({pool.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,250 @@
+import argparse, json, math, os, sys, time, uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# Per-job performance telemetry: one JSON Lines record per job with stage
+# durations (monotonic clock), label/page/byte counts, peak RSS and cache
+# hit rates. Run this file to summarise recent jobs.
+#
+# Set LABELS_TELEMETRY=0 to disable logging, LABELS_TELEMETRY_FILE to move the log.
+
+TELEMETRY_FILE = Path(os.environ.get('LABELS_TELEMETRY_FILE', Path.home() / '.labelprinter_telemetry.jsonl'))
+MAX_LOG_BYTES = 5 * 1024 * 1024  # Rotate to <file>.1 beyond this size
+STALE_LOCK_S = 60  # A rotation lock older than this was left behind by a crash
+
+# Top-level record fields that are not per-job counters
+RECORD_FIELDS = {'ts', 'job_id', 'kind', 'pid', 'total_s', 'stages', 'peak_rss', 'caches'}
+
+def current_rss_bytes():
+    """Resident set size of this process, or None if it can't be read"""
+    if sys.platform == 'win32':
+        return _windows_memory_info('WorkingSetSize')
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def process_peak_rss_bytes():
+    """Peak resident set size over the lifetime of this process"""
+    if sys.platform == 'win32':
+        return _windows_memory_info('PeakWorkingSetSize')
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+def _windows_memory_info(field):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return getattr(counters, field)
+    except (AttributeError, OSError):
+        return None
+
+class JobTelemetry:
+    """Collects stage timings, counters and cache stats for one job"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.job_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.caches = {}
+        self.peak_rss = current_rss_bytes()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; repeated stages with the same name accumulate"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+            self.sample_memory()
+
+    def sample_memory(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def cache(self, name, hits=0, misses=0):
+        entry = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+        entry['hits'] += hits
+        entry['misses'] += misses
+
+    def export(self):
+        """Stages, counters, caches and peak RSS, for merging into a job in another process"""
+        self.sample_memory()
+        return {
+            'stages': self.stages,
+            'counters': self.counters,
+            'caches': self.caches,
+            'peak_rss': self.peak_rss
+        }
+
+    def merge(self, data):
+        """Fold in telemetry exported by a render worker, so the job keeps one record"""
+        for name, seconds in data['stages'].items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        for name, value in data['counters'].items():
+            self.count(name, value)
+        for name, c in data['caches'].items():
+            self.cache(name, c['hits'], c['misses'])
+        rss = data['peak_rss']
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def record(self):
+        self.sample_memory()
+        peak = self.peak_rss if self.peak_rss is not None else process_peak_rss_bytes()
+        return {
+            'ts': time.time(),
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'pid': os.getpid(),
+            **self.counters,
+            'total_s': round(time.perf_counter() - self.started, 6),
+            'stages': {k: round(v, 6) for k, v in self.stages.items()},
+            'peak_rss': peak,
+            'caches': self.caches
+        }
+
+    def write(self, path=None):
+        """Append this job's record to the log; telemetry never fails a job"""
+        if os.environ.get('LABELS_TELEMETRY', '1') == '0':
+            return
+        path = Path(path or TELEMETRY_FILE)
+        try:
+            if path.exists() and path.stat().st_size > MAX_LOG_BYTES:
+                rotate_log(path)
+            line = json.dumps(self.record(), ensure_ascii=False) + '\n'
+            # One write() per record keeps concurrent appenders from interleaving lines
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass
+
+def rotate_log(path):
+    """Move the log to <file>.1, holding a lock file so concurrent writers rotate it only once"""
+    lock = path.with_name(path.name + '.lock')
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Another process is rotating; just clear a lock left behind by a crash
+        if time.time() - lock.stat().st_mtime > STALE_LOCK_S:
+            lock.unlink()
+        return
+    try:
+        # Re-check under the lock: another process may have rotated already
+        if path.exists() and path.stat().st_size > MAX_LOG_BYTES:
+            os.replace(path, path.with_name(path.name + '.1'))
+    finally:
+        os.close(fd)
+        lock.unlink()
+
+def load_records(path, last=None, kind=None):
+    records = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if kind is None or rec.get('kind') == kind:
+                    records.append(rec)
+    except FileNotFoundError:
+        return []
+    return records[-last:] if last else records
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+def summarise(records):
+    """Return summary text for a list of records, grouped by job kind"""
+    if not records:
+        return "No telemetry records."
+    out = []
+    for kind in sorted({r.get('kind', '?') for r in records}):
+        recs = [r for r in records if r.get('kind', '?') == kind]
+        out.append(f"== {kind}: {len(recs)} jobs ==")
+        out.append(f"{'stage':<16}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+        stage_names = sorted({s for r in recs for s in r.get('stages', {})})
+        rows = [(s, [r['stages'][s] for r in recs if s in r.get('stages', {})]) for s in stage_names]
+        rows.append(('total', [r['total_s'] for r in recs if 'total_s' in r]))
+        for name, values in rows:
+            if values:
+                ms = [v * 1000 for v in values]
+                out.append(f"{name:<16}" + ''.join(f"{percentile(ms, p):>10.1f}" for p in (50, 90, 99)) + f"{max(ms):>10.1f}")
+
+        counters = sorted({k for r in recs for k, v in r.items()
+                           if k not in RECORD_FIELDS and isinstance(v, (int, float))})
+        for counter in counters:
+            values = [r[counter] for r in recs if counter in r]
+            if values:
+                out.append(f"{counter}: total {sum(values)}, p50 {percentile(values, 50)}, max {max(values)}")
+
+        rss = [r['peak_rss'] for r in recs if r.get('peak_rss')]
+        if rss:
+            mb = [v / (1024 * 1024) for v in rss]
+            out.append(f"peak RSS MB: p50 {percentile(mb, 50):.1f}, max {max(mb):.1f}")
+
+        caches = {}
+        for r in recs:
+            for name, c in r.get('caches', {}).items():
+                agg = caches.setdefault(name, [0, 0])
+                agg[0] += c.get('hits', 0)
+                agg[1] += c.get('misses', 0)
+        for name, (hits, misses) in sorted(caches.items()):
+            if hits + misses:
+                out.append(f"cache {name}: {hits / (hits + misses):.1%} hits ({hits}/{hits + misses})")
+        out.append("")
+    return "\n".join(out)
+
+def non_negative_int(value):
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got {value!r}") from None
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {n}")
+    return n
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise label job telemetry")
+    parser.add_argument('--last', type=non_negative_int, default=200, help="Number of recent jobs to include (0 = all)")
+    parser.add_argument('--kind', help="Only jobs of this kind (generate, print, import, render, watch)")
+    parser.add_argument('--file', default=str(TELEMETRY_FILE))
+    args = parser.parse_args()
+    print(summarise(load_records(args.file, args.last or None, args.kind)))
+
+if __name__ == "__main__":
+    main()
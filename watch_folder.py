@@ -0,0 +1,267 @@
+import argparse, hashlib, json, logging, os, platform, shutil, subprocess, threading, time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from pathlib import Path
+
+from label_renderer import LabelRenderer, read_label_file, split_labels
+from render_server import RenderPool, job_settings
+from telemetry import JobTelemetry
+
+# Hot-folder daemon: watches a folder for XLSX/CSV exports, renders each one
+# with a font-warmed RenderPool and writes (or prints) the PDF. Inputs are
+# moved to done/ or failed/. Processed files are remembered by name, size,
+# mtime and content hash, so a restart never reprints a file, while a fresh
+# export is printed even if its content repeats an earlier one. A file is
+# recorded as "printing" before it goes to the printer, so even a crash
+# mid-print doesn't reprint it.
+
+WATCHED_SUFFIXES = {'.xlsx', '.xlsm', '.csv'}
+
+log = logging.getLogger("watch_folder")
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def unique_path(path):
+    """Return `path`, or a timestamped sibling if it already exists"""
+    if not path.exists():
+        return path
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return path.with_name(f"{path.stem}_{stamp}{path.suffix}")
+
+def print_pdf(filename, printer=None):
+    """Hand a PDF to the print queue (default printer unless `printer` is given)"""
+    if platform.system() == 'Windows':
+        if printer:
+            import win32api
+            win32api.ShellExecute(0, "printto", str(filename), f'"{printer}"', ".", 0)
+        else:
+            os.startfile(str(filename), 'print')
+    else:
+        cmd = ['lp'] + (['-d', printer] if printer else []) + [str(filename)]
+        subprocess.run(cmd, check=True)
+
+def file_key(path, digest):
+    """Identity of one export: name, size and mtime together with the content hash"""
+    st = path.stat()
+    return f"{path.name}|{st.st_size}|{st.st_mtime_ns}|{digest}"
+
+class ProcessedRecord:
+    """Persisted {file_key: info} record of files that were already rendered"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        try:
+            self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            self.entries = {}
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def add(self, key, info):
+        with self.lock:
+            self.entries[key] = info
+            self._save()
+
+    def remove(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a truncated record
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.entries, indent=1, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+class FolderWatcher:
+    def __init__(self, folder, out_dir, done_dir, failed_dir, settings, lines_per_label,
+                 workers=2, interval=2.0, print_output=False, printer=None, render_timeout=300):
+        self.folder = Path(folder)
+        self.out_dir, self.done_dir, self.failed_dir = Path(out_dir), Path(done_dir), Path(failed_dir)
+        for d in (self.out_dir, self.done_dir, self.failed_dir):
+            d.mkdir(parents=True, exist_ok=True)
+        self.settings = settings
+        self.lines_per_label = lines_per_label
+        self.interval = interval
+        self.print_output = print_output
+        self.printer = printer
+        self.render_timeout = render_timeout  # A crashed pool worker never answers
+
+        self.record = ProcessedRecord(self.folder / '.processed.json')
+        for info in self.record.entries.values():
+            if info.get('status') == 'printing':
+                log.warning("%s was being printed when the watcher stopped - it is not printed again, check %s",
+                            info['file'], info['output'])
+        self.render_pool = RenderPool(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.in_flight = set()  # Paths queued or being processed
+        self.in_flight_lock = threading.Lock()
+        self.last_seen = {}  # path -> (size, mtime) from the previous scan
+
+    def scan(self):
+        """Return input files whose size and mtime did not change since the last scan"""
+        ready, seen = [], {}
+        for path in self.folder.iterdir():
+            if not path.is_file() or path.suffix.lower() not in WATCHED_SUFFIXES:
+                continue
+            if path.name.startswith(('.', '~$')):  # Hidden files and Office lock files
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen[path] = (st.st_size, st.st_mtime)
+            # Still being written if it changed since the previous scan
+            if self.last_seen.get(path) == seen[path]:
+                ready.append(path)
+        self.last_seen = seen
+        return ready
+
+    def run(self):
+        log.info("Watching %s (%d workers)", self.folder, self.render_pool.workers)
+        try:
+            while True:
+                for path in self.scan():
+                    with self.in_flight_lock:
+                        if path in self.in_flight:
+                            continue
+                        self.in_flight.add(path)
+                    self.executor.submit(self.process_file, path)
+                time.sleep(self.interval)
+        finally:
+            self.executor.shutdown(wait=True)
+            self.render_pool.close()
+
+    def process_file(self, path):
+        printing_key = None
+        try:
+            digest = file_digest(path)
+            key = file_key(path, digest)
+            # `in_flight` keeps a path from being queued twice, so only a
+            # restart can bring back a file that is already recorded
+            if key in self.record:
+                log.info("%s already processed - skipping", path.name)
+                self.move(path, self.done_dir)
+                return
+
+            tm = JobTelemetry('watch')
+            with tm.stage('file_parse'):
+                lines = read_label_file(path)
+            if not lines:
+                raise ValueError("No data in the first column")
+            labels = split_labels("\n".join(lines), self.lines_per_label)
+            try:
+                pdf = self.render_pool.render({
+                    'labels': labels,
+                    'lines_per_label': self.lines_per_label,
+                    'settings': self.settings
+                }, timeout=self.render_timeout, telemetry=tm)
+            except FutureTimeout:
+                raise TimeoutError(f"Render timed out after {self.render_timeout:g} s") from None
+
+            out_file = unique_path(self.out_dir / f"{path.stem}.pdf")
+            out_file.write_bytes(pdf)
+            info = {
+                'file': path.name,
+                'sha256': digest,
+                'output': str(out_file),
+                'labels': len(labels),
+                'printed': self.print_output,
+                'processed_at': datetime.now().isoformat(timespec='seconds')
+            }
+            if self.print_output:
+                self.record.add(key, {**info, 'status': 'printing'})
+                printing_key = key
+                with tm.stage('print'):
+                    print_pdf(out_file, self.printer)
+            self.record.add(key, {**info, 'status': 'done'})
+            printing_key = None
+            tm.write()
+
+            self.move(path, self.done_dir)
+            log.info("%s -> %s (%d labels, job %s)", path.name, out_file.name, len(labels), tm.job_id)
+        except Exception as e:
+            log.error("%s failed: %s", path.name, e)
+            if printing_key is not None:
+                # The print was refused, so a retried file must print again
+                self.record.remove(printing_key)
+            try:
+                self.move(path, self.failed_dir)
+            except OSError as move_error:
+                log.error("Could not move %s to %s: %s", path.name, self.failed_dir, move_error)
+        finally:
+            with self.in_flight_lock:
+                self.in_flight.discard(path)
+
+    def move(self, path, target_dir):
+        shutil.move(str(path), str(unique_path(target_dir / path.name)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a folder and render label PDFs unattended")
+    parser.add_argument('folder', help="Input folder to watch for XLSX/CSV files")
+    parser.add_argument('--out', help="PDF output folder (default: <folder>/out)")
+    parser.add_argument('--done', help="Folder for processed inputs (default: <folder>/done)")
+    parser.add_argument('--failed', help="Folder for failed inputs (default: <folder>/failed)")
+    parser.add_argument('--print', dest='print_output', action='store_true', help="Send each PDF to the printer")
+    parser.add_argument('--printer', help="Printer name (default: system default printer)")
+    parser.add_argument('--workers', type=int, default=2, help="Files processed concurrently")
+    parser.add_argument('--interval', type=float, default=2.0, help="Polling interval (s)")
+    parser.add_argument('--timeout', type=float, default=300, help="Per-file render timeout (s)")
+    parser.add_argument('--lines', type=int, default=3, help="Lines per label")
+    parser.add_argument('--font', default="Arial")
+    parser.add_argument('--size', type=int, default=18, help="Font size (pt)")
+    parser.add_argument('--bold', action='store_true')
+    parser.add_argument('--padding', type=float, default=2, help="Horizontal padding (mm)")
+    parser.add_argument('--left-extra', type=float, default=0, help="Extra left padding for left column (mm)")
+    parser.add_argument('--right-extra', type=float, default=0, help="Extra right padding for right column (mm)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    folder = Path(args.folder)
+    settings = {
+        'font_name': args.font,
+        'font_size': args.size,
+        'bold': args.bold,
+        'h_padding': args.padding,
+        'left_extra': args.left_extra,
+        'right_extra': args.right_extra
+    }
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.lines < 1:
+        parser.error("--lines must be at least 1")
+    # Fail now rather than moving every export to failed/ one by one
+    try:
+        job_settings({'settings': settings})
+        LabelRenderer.register_fonts_for_pdf()
+        LabelRenderer(**settings).check_font_installed()
+    except ValueError as e:
+        parser.error(str(e))
+
+    watcher = FolderWatcher(
+        folder,
+        args.out or folder / 'out',
+        args.done or folder / 'done',
+        args.failed or folder / 'failed',
+        settings, args.lines,
+        workers=args.workers, interval=args.interval,
+        print_output=args.print_output, printer=args.printer, render_timeout=args.timeout
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()